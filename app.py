@@ -1,16 +1,43 @@
 # app.py - Main REST API Server Application
+import hmac
+import itertools
 import json
 import random
+import re
 import time
-from flask import Flask, request, jsonify, abort, make_response
+from flask import Flask, Response, request, jsonify, abort, make_response
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+import orjson
 import os
 from functools import wraps
-from werkzeug.exceptions import HTTPException
+from werkzeug.exceptions import HTTPException, InternalServerError, TooManyRequests, UnprocessableEntity
+
+# Encode with orjson, falling back to the stdlib for values it rejects
+# (integers beyond 64 bits, which the stdlib parser keeps exact)
+def _dumps(obj):
+    try:
+        return orjson.dumps(obj)
+    except orjson.JSONEncodeError:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+# JSON provider backed by orjson instead of the stdlib json module.
+# Output is always compact with unsorted keys, responses are consumed by machine clients.
+class OrjsonProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return _dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
+# Build a JSON response straight from orjson bytes, bypassing jsonify
+def _json(payload, status=200):
+    return Response(_dumps(payload), status=status, mimetype="application/json")
+
 # Configuration for different themes
 THEMES = {
     "space_exploration": {
@@ -30,12 +57,48 @@ THEMES = {
     }
 }
 
-# Data storage (in-memory for simplicity)
-data_store = {}
-for theme, info in THEMES.items():
-    data_store[theme] = {}
-    for entity in info["entities"]:
-        data_store[theme][entity] = []
+# Data storage (in-memory for simplicity), keyed by (theme, entity type)
+# with entities indexed by ID
+data_store = {
+    (theme, entity): {}
+    for theme, info in THEMES.items()
+    for entity in info["entities"]
+}
+
+# Fields every new entity must provide
+_REQUIRED_FIELDS = ("name", "description")
+
+# orjson turns integers beyond 64 bits into floats, so bodies containing a
+# long enough digit run are left to the stdlib parser, which keeps them exact
+_LONG_DIGITS = re.compile(rb"\d{19}")
+
+# Parse a JSON object request body, returning None if it is not JSON (like
+# get_json(silent=True)) or not an object, since entities are updated in place
+def _parse_body():
+    if not request.is_json:
+        return None
+    raw = request.get_data(cache=False)
+    data = None
+    if not _LONG_DIGITS.search(raw):
+        try:
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # May still be valid for the stdlib parser (NaN, Infinity)
+    if data is None:
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return None
+    return data if isinstance(data, dict) else None
+
+# Validate theme and entity type with a single lookup, returning the matching entity store
+def _resolve_store(theme_id, entity_type):
+    store = data_store.get((theme_id, entity_type))
+    if store is None:
+        if theme_id not in THEMES:
+            abort(404, description=f"Theme '{theme_id}' not found")
+        abort(404, description=f"Entity type '{entity_type}' not found in theme '{theme_id}'")
+    return store
 
 # Error simulation configuration 
 ERROR_TYPES = {
@@ -44,236 +107,253 @@ ERROR_TYPES = {
     "server_error": {"chance": 0.1, "description": "Internal server error simulation"},
     "validation_error": {"chance": 0.2, "description": "Data validation error simulation"}
 }
+_ERROR_KEYS = tuple(ERROR_TYPES)
+_ERROR_CUM_WEIGHTS = list(itertools.accumulate(ERROR_TYPES[t]["chance"] for t in _ERROR_KEYS))
 
-# Configuration from environment variables
-def get_config():
-    return {
-        "error_rate": float(os.environ.get("ERROR_RATE", "0.2")),  # 20% error rate by default
-        "timeout_seconds": float(os.environ.get("TIMEOUT_SECONDS", "2.0")),  # Max timeout in seconds
-    }
+# Dedicated generator for error simulation, separate from the module-global one
+_rng = random.Random()
+
+# Configuration from environment variables, read once at startup
+ERROR_RATE = float(os.environ.get("ERROR_RATE", "0.2"))  # 20% error rate by default
+TIMEOUT_SECONDS = float(os.environ.get("TIMEOUT_SECONDS", "2.0"))  # Max timeout in seconds
+
+# Simple fixed token for testing
+_EXPECTED_TOKEN = b"student_test_token"
+
+# Timestamp formatting cached per second, matching the format's resolution.
+# The (second, text) pair is swapped as a whole so readers never see a mix.
+_ts_cache = (0, "")
+
+def _now_str():
+    global _ts_cache
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache = (now, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)))
+    return _ts_cache[1]
 
-# Token validation middleware
-def token_required(f):
+# Error simulation
+def _maybe_inject_error():
+    # Random chance to simulate errors based on configured error rate
+    if _rng.random() < ERROR_RATE:
+        error_type = _rng.choices(_ERROR_KEYS, cum_weights=_ERROR_CUM_WEIGHTS, k=1)[0]
+        
+        if error_type == "timeout":
+            # Simulate a slow response
+            time.sleep(_rng.uniform(1.0, TIMEOUT_SECONDS))
+        else:
+            _abort_canned(error_type)
+
+# Middleware for protected endpoints: token validation, then error simulation
+def protected(f):
+    # Decided once at decoration time, error simulation is skipped entirely when disabled
+    simulate = ERROR_RATE > 0
+    
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('X-API-Token')
+        # Read the header straight from the WSGI environ
+        token = request.environ.get('HTTP_X_API_TOKEN')
         if not token:
             abort(401, description="API token is missing")
-        if token != "student_test_token":  # Simple fixed token for testing
+        if not hmac.compare_digest(token.encode(), _EXPECTED_TOKEN):
             abort(403, description="Invalid API token")
+        if simulate:
+            _maybe_inject_error()
         return f(*args, **kwargs)
     return decorated
 
-# Error simulation middleware
-def simulate_errors(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        config = get_config()
-        
-        # Random chance to simulate errors based on configured error rate
-        if random.random() < config["error_rate"]:
-            error_type = random.choices(
-                list(ERROR_TYPES.keys()), 
-                weights=[ERROR_TYPES[t]["chance"] for t in ERROR_TYPES.keys()],
-                k=1
-            )[0]
-            
-            if error_type == "timeout":
-                # Simulate a slow response
-                time.sleep(random.uniform(1.0, config["timeout_seconds"]))
-                
-            elif error_type == "rate_limit":
-                abort(429, description="Rate limit exceeded. Try again later.")
-                
-            elif error_type == "server_error":
-                abort(500, description="Internal server error occurred")
-                
-            elif error_type == "validation_error":
-                abort(422, description="Invalid data format or content")
-        
-        return f(*args, **kwargs)
-    return decorated
-
-# Custom error handler
-@app.errorhandler(HTTPException)
-def handle_exception(e):
-    response = e.get_response()
-    response.data = json.dumps({
+# Serialize an HTTP exception into the API's JSON error body
+def _error_body(e):
+    return orjson.dumps({
         "code": e.code,
         "name": e.name,
         "description": e.description,
     })
-    response.content_type = "application/json"
-    return response
 
-# Root endpoint - API information
+# Custom error handler
+@app.errorhandler(HTTPException)
+def handle_exception(e):
+    # Keep exception specific headers (e.g. Allow on 405) but not the HTML content type
+    headers = [(key, value) for key, value in e.get_headers() if key.lower() != "content-type"]
+    return Response(_error_body(e), status=e.code, headers=headers, mimetype="application/json")
+
+# Error bodies for the simulated error types, serialized once at startup
+_CANNED_ERRORS = {
+    error_type: (e.code, _error_body(e))
+    for error_type, e in (
+        ("rate_limit", TooManyRequests(description="Rate limit exceeded. Try again later.")),
+        ("server_error", InternalServerError(description="Internal server error occurred")),
+        ("validation_error", UnprocessableEntity(description="Invalid data format or content")),
+    )
+}
+
+# Abort with the precomputed response for a simulated error type
+def _abort_canned(error_type):
+    code, body = _CANNED_ERRORS[error_type]
+    abort(Response(body, status=code, mimetype="application/json"))
+
+# Root endpoint - API information (static, serialized once at startup)
+_API_INFO_JSON = orjson.dumps({
+    "name": "Integration Testing Learning API",
+    "version": "1.0.0",
+    "description": "API for learning integration testing with different themes",
+    "themes": {theme: info["name"] for theme, info in THEMES.items()},
+    "documentation": "/docs",
+})
+
 @app.route('/', methods=['GET'])
 def get_api_info():
-    return jsonify({
-        "name": "Integration Testing Learning API",
-        "version": "1.0.0",
-        "description": "API for learning integration testing with different themes",
-        "themes": {theme: info["name"] for theme, info in THEMES.items()},
-        "documentation": "/docs",
-    })
+    return Response(_API_INFO_JSON, mimetype="application/json")
+
+# Documentation endpoint (static, serialized once at startup)
+_DOCS_JSON = orjson.dumps({
+    "documentation": "API Documentation",
+    "endpoints": [
+        {"path": "/", "method": "GET", "description": "Get API information"},
+        {"path": "/docs", "method": "GET", "description": "Get API documentation"},
+        {"path": "/themes", "method": "GET", "description": "List available themes"},
+        {"path": "/themes/<theme_id>", "method": "GET", "description": "Get theme details"},
+        {"path": "/themes/<theme_id>/<entity_type>", "method": "GET", "description": "List entities of a type"},
+        {"path": "/themes/<theme_id>/<entity_type>", "method": "POST", "description": "Create a new entity"},
+        {"path": "/themes/<theme_id>/<entity_type>/<entity_id>", "method": "GET", "description": "Get entity details"},
+        {"path": "/themes/<theme_id>/<entity_type>/<entity_id>", "method": "PUT", "description": "Update an entity"},
+        {"path": "/themes/<theme_id>/<entity_type>/<entity_id>", "method": "DELETE", "description": "Delete an entity"},
+        {"path": "/error-test", "method": "GET", "description": "Test different error responses"}
+    ],
+    "authentication": "Use X-API-Token header with value 'student_test_token'",
+    "error_simulation": "The API randomly simulates errors for testing purposes",
+})
 
-# Documentation endpoint
 @app.route('/docs', methods=['GET'])
 def get_docs():
-    return jsonify({
-        "documentation": "API Documentation",
-        "endpoints": [
-            {"path": "/", "method": "GET", "description": "Get API information"},
-            {"path": "/docs", "method": "GET", "description": "Get API documentation"},
-            {"path": "/themes", "method": "GET", "description": "List available themes"},
-            {"path": "/themes/<theme_id>", "method": "GET", "description": "Get theme details"},
-            {"path": "/themes/<theme_id>/<entity_type>", "method": "GET", "description": "List entities of a type"},
-            {"path": "/themes/<theme_id>/<entity_type>", "method": "POST", "description": "Create a new entity"},
-            {"path": "/themes/<theme_id>/<entity_type>/<entity_id>", "method": "GET", "description": "Get entity details"},
-            {"path": "/themes/<theme_id>/<entity_type>/<entity_id>", "method": "PUT", "description": "Update an entity"},
-            {"path": "/themes/<theme_id>/<entity_type>/<entity_id>", "method": "DELETE", "description": "Delete an entity"},
-            {"path": "/error-test", "method": "GET", "description": "Test different error responses"}
-        ],
-        "authentication": "Use X-API-Token header with value 'student_test_token'",
-        "error_simulation": "The API randomly simulates errors for testing purposes",
-    })
+    return Response(_DOCS_JSON, mimetype="application/json")
+
+# List themes (static, serialized once at startup)
+_THEMES_JSON = orjson.dumps({
+    "themes": [
+        {"id": theme_id, "name": info["name"], "description": info["description"]}
+        for theme_id, info in THEMES.items()
+    ]
+})
 
-# List themes
 @app.route('/themes', methods=['GET'])
 def get_themes():
-    return jsonify({
-        "themes": [
-            {"id": theme_id, "name": info["name"], "description": info["description"]}
-            for theme_id, info in THEMES.items()
-        ]
-    })
+    return Response(_THEMES_JSON, mimetype="application/json")
+
+# Get theme details, only the entity counts are computed per request
+_THEME_DETAILS = {
+    theme_id: (
+        {"id": theme_id, "name": info["name"], "description": info["description"]},
+        tuple(info["entities"]),
+    )
+    for theme_id, info in THEMES.items()
+}
 
-# Get theme details
 @app.route('/themes/<theme_id>', methods=['GET'])
 def get_theme(theme_id):
-    if theme_id not in THEMES:
+    details = _THEME_DETAILS.get(theme_id)
+    if details is None:
         abort(404, description=f"Theme '{theme_id}' not found")
     
-    return jsonify({
-        "id": theme_id,
-        **THEMES[theme_id],
+    skeleton, entity_types = details
+    return _json({
+        **skeleton,
         "entities": [
-            {"type": entity, "count": len(data_store[theme_id][entity])}
-            for entity in THEMES[theme_id]["entities"]
+            {"type": entity, "count": len(data_store[(theme_id, entity)])}
+            for entity in entity_types
         ]
     })
 
 # List entities
 @app.route('/themes/<theme_id>/<entity_type>', methods=['GET'])
-@token_required
-@simulate_errors
+@protected
 def list_entities(theme_id, entity_type):
-    if theme_id not in THEMES:
-        abort(404, description=f"Theme '{theme_id}' not found")
-    if entity_type not in THEMES[theme_id]["entities"]:
-        abort(404, description=f"Entity type '{entity_type}' not found in theme '{theme_id}'")
+    store = _resolve_store(theme_id, entity_type)
     
-    return jsonify({
+    return _json({
         "theme": theme_id,
         "entity_type": entity_type,
-        "items": data_store[theme_id][entity_type]
+        "items": list(store.values())
     })
 
 # Create entity
 @app.route('/themes/<theme_id>/<entity_type>', methods=['POST'])
-@token_required
-@simulate_errors
+@protected
 def create_entity(theme_id, entity_type):
-    if theme_id not in THEMES:
-        abort(404, description=f"Theme '{theme_id}' not found")
-    if entity_type not in THEMES[theme_id]["entities"]:
-        abort(404, description=f"Entity type '{entity_type}' not found in theme '{theme_id}'")
+    store = _resolve_store(theme_id, entity_type)
     
-    data = request.get_json(silent=True)
+    data = _parse_body()
     if not data:
         abort(400, description="Invalid JSON data")
     
     # Ensure required fields based on entity type
-    required_fields = {"name", "description"}
-    if not all(field in data for field in required_fields):
-        missing = [field for field in required_fields if field not in data]
+    missing = [field for field in _REQUIRED_FIELDS if field not in data]
+    if missing:
         abort(400, description=f"Missing required fields: {', '.join(missing)}")
     
-    # Create new entity with ID
+    # Create new entity with ID, skipping IDs still held after deletions
+    next_id = len(store) + 1
+    while str(next_id) in store:
+        next_id += 1
+    new_id = str(next_id)
     new_entity = {
-        "id": str(len(data_store[theme_id][entity_type]) + 1),
+        "id": new_id,
         **data,
-        "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        "created_at": _now_str()
     }
+    new_entity["id"] = new_id  # The generated ID always wins over one in the body
     
-    data_store[theme_id][entity_type].append(new_entity)
+    store[new_id] = new_entity
     
-    return jsonify(new_entity), 201
+    return _json(new_entity, 201)
 
 # Get entity details
 @app.route('/themes/<theme_id>/<entity_type>/<entity_id>', methods=['GET'])
-@token_required
-@simulate_errors
+@protected
 def get_entity(theme_id, entity_type, entity_id):
-    if theme_id not in THEMES:
-        abort(404, description=f"Theme '{theme_id}' not found")
-    if entity_type not in THEMES[theme_id]["entities"]:
-        abort(404, description=f"Entity type '{entity_type}' not found in theme '{theme_id}'")
+    store = _resolve_store(theme_id, entity_type)
     
-    for entity in data_store[theme_id][entity_type]:
-        if entity["id"] == entity_id:
-            return jsonify(entity)
+    entity = store.get(entity_id)
+    if entity is None:
+        abort(404, description=f"Entity with ID '{entity_id}' not found")
     
-    abort(404, description=f"Entity with ID '{entity_id}' not found")
+    return _json(entity)
 
 # Update entity
 @app.route('/themes/<theme_id>/<entity_type>/<entity_id>', methods=['PUT'])
-@token_required
-@simulate_errors
+@protected
 def update_entity(theme_id, entity_type, entity_id):
-    if theme_id not in THEMES:
-        abort(404, description=f"Theme '{theme_id}' not found")
-    if entity_type not in THEMES[theme_id]["entities"]:
-        abort(404, description=f"Entity type '{entity_type}' not found in theme '{theme_id}'")
+    store = _resolve_store(theme_id, entity_type)
     
-    data = request.get_json(silent=True)
+    data = _parse_body()
     if not data:
         abort(400, description="Invalid JSON data")
     
-    for i, entity in enumerate(data_store[theme_id][entity_type]):
-        if entity["id"] == entity_id:
-            # Update entity but preserve ID and creation timestamp
-            updated_entity = {
-                **entity,
-                **data,
-                "id": entity_id,  # Ensure ID remains unchanged
-                "created_at": entity["created_at"],  # Preserve original creation time
-                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            data_store[theme_id][entity_type][i] = updated_entity
-            return jsonify(updated_entity)
+    entity = store.get(entity_id)
+    if entity is None:
+        abort(404, description=f"Entity with ID '{entity_id}' not found")
     
-    abort(404, description=f"Entity with ID '{entity_id}' not found")
+    # Update entity in place but preserve ID and creation timestamp
+    created_at = entity["created_at"]
+    entity.update(data)
+    entity["id"] = entity_id  # Ensure ID remains unchanged
+    entity["created_at"] = created_at  # Preserve original creation time
+    entity["updated_at"] = _now_str()
+    return _json(entity)
 
 # Delete entity
 @app.route('/themes/<theme_id>/<entity_type>/<entity_id>', methods=['DELETE'])
-@token_required
-@simulate_errors
+@protected
 def delete_entity(theme_id, entity_type, entity_id):
-    if theme_id not in THEMES:
-        abort(404, description=f"Theme '{theme_id}' not found")
-    if entity_type not in THEMES[theme_id]["entities"]:
-        abort(404, description=f"Entity type '{entity_type}' not found in theme '{theme_id}'")
+    store = _resolve_store(theme_id, entity_type)
     
-    for i, entity in enumerate(data_store[theme_id][entity_type]):
-        if entity["id"] == entity_id:
-            deleted = data_store[theme_id][entity_type].pop(i)
-            return jsonify({
-                "message": f"Entity '{entity_id}' deleted successfully",
-                "deleted": deleted
-            })
+    deleted = store.pop(entity_id, None)
+    if deleted is None:
+        abort(404, description=f"Entity with ID '{entity_id}' not found")
     
-    abort(404, description=f"Entity with ID '{entity_id}' not found")
+    return jsonify({
+        "message": f"Entity '{entity_id}' deleted successfully",
+        "deleted": deleted
+    })
 
 # Error testing endpoint
 @app.route('/error-test', methods=['GET'])
@@ -292,48 +372,41 @@ def test_errors():
         time.sleep(3)  # Fixed long delay
         return jsonify({"message": "Response after timeout"})
     
-    elif error_type == "rate_limit":
-        abort(429, description="Rate limit exceeded. Try again later.")
-    
-    elif error_type == "server_error":
-        abort(500, description="Internal server error occurred")
-    
-    elif error_type == "validation_error":
-        abort(422, description="Invalid data format or content")
+    _abort_canned(error_type)
 
 # Initialize sample data
 def init_sample_data():
     # Space Exploration theme
-    data_store["space_exploration"]["missions"] = [
-        {
+    data_store[("space_exploration", "missions")] = {
+        "1": {
             "id": "1", 
             "name": "Mars Rover Mission", 
             "description": "Explore the surface of Mars",
             "status": "in-progress",
             "created_at": "2023-01-15 10:30:00"
         },
-        {
+        "2": {
             "id": "2", 
             "name": "Jupiter Orbital", 
             "description": "Study Jupiter's atmosphere",
             "status": "planned",
             "created_at": "2023-02-20 14:45:00"
         }
-    ]
+    }
     
-    data_store["space_exploration"]["astronauts"] = [
-        {
+    data_store[("space_exploration", "astronauts")] = {
+        "1": {
             "id": "1", 
             "name": "Dr. Sarah Chen", 
             "description": "Astrophysicist and mission specialist",
             "specialty": "Planetary geology",
             "created_at": "2023-01-10 09:20:00"
         }
-    ]
+    }
     
     # Fantasy RPG theme
-    data_store["fantasy_rpg"]["characters"] = [
-        {
+    data_store[("fantasy_rpg", "characters")] = {
+        "1": {
             "id": "1", 
             "name": "Elindra", 
             "description": "Elven ranger from the western forests",
@@ -341,10 +414,10 @@ def init_sample_data():
             "level": 5,
             "created_at": "2023-03-05 11:15:00"
         }
-    ]
+    }
     
-    data_store["fantasy_rpg"]["quests"] = [
-        {
+    data_store[("fantasy_rpg", "quests")] = {
+        "1": {
             "id": "1", 
             "name": "The Lost Artifact", 
             "description": "Recover an ancient artifact from the ruins",
@@ -352,21 +425,21 @@ def init_sample_data():
             "reward": "500 gold",
             "created_at": "2023-03-10 16:20:00"
         }
-    ]
+    }
     
     # Smart City theme
-    data_store["smart_city"]["traffic_sensors"] = [
-        {
+    data_store[("smart_city", "traffic_sensors")] = {
+        "1": {
             "id": "1", 
             "name": "Downtown Junction A", 
             "description": "Main intersection traffic monitor",
             "status": "active",
             "created_at": "2023-04-12 08:30:00"
         }
-    ]
+    }
     
-    data_store["smart_city"]["public_transport"] = [
-        {
+    data_store[("smart_city", "public_transport")] = {
+        "1": {
             "id": "1", 
             "name": "Metro Line 1", 
             "description": "North-South metro connection",
@@ -374,9 +447,11 @@ def init_sample_data():
             "capacity": 1200,
             "created_at": "2023-04-15 13:45:00"
         }
-    ]
+    }
+
+# Load sample data at import so WSGI servers (gunicorn) serve it too
+init_sample_data()
 
 if __name__ == "__main__":
-    init_sample_data()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
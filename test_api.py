@@ -2,6 +2,7 @@
 import pytest
 import requests
 import json
+import orjson
 import time
 import logging
 from datetime import datetime
@@ -18,26 +19,33 @@ BASE_URL = "http://localhost:5000"  # Update this if your API is hosted elsewher
 API_TOKEN = "student_test_token"
 HEADERS = {"X-API-Token": API_TOKEN, "Content-Type": "application/json"}
 
+# Shared session so requests reuse keep-alive connections
+_SESSION = requests.Session()
+
 # --- Helper functions ---
 
 def log_request(method, url, headers=None, data=None):
     """Log details of a request"""
     logger.info(f"Request: {method} {url}")
+    # Only serialize payloads when debug output will actually be emitted
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     if headers:
-        logger.debug(f"Headers: {json.dumps(headers)}")
+        logger.debug("Headers: %s", orjson.dumps(headers).decode())
     if data:
-        logger.debug(f"Data: {json.dumps(data)}")
+        logger.debug("Data: %s", orjson.dumps(data).decode())
 
 def log_response(response):
     """Log details of a response"""
     logger.info(f"Response: {response.status_code} {response.reason}")
     try:
         content = response.json()
-        logger.debug(f"Content: {json.dumps(content)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Content: %s", orjson.dumps(content).decode())
         return content
     except json.JSONDecodeError:
         logger.warning("Response is not valid JSON")
-        logger.debug(f"Content: {response.text}")
+        logger.debug("Content: %s", response.text)
         return None
 
 def make_request(method, endpoint, expected_status=None, headers=None, json_data=None, retry=2, retry_delay=1):
@@ -52,7 +60,7 @@ def make_request(method, endpoint, expected_status=None, headers=None, json_data
     
     for attempt in range(retry + 1):
         try:
-            response = requests.request(
+            response = _SESSION.request(
                 method=method,
                 url=url,
                 headers=request_headers,
@@ -203,6 +211,33 @@ def test_create_entity_validation(theme, entity_type):
     assert response.status_code == 400
     assert "description" in content.get("description", "").lower()
 
+def test_create_entity_ignores_client_id(theme, entity_type, create_test_entity):
+    """Test that a client-supplied ID cannot overwrite an existing entity"""
+    existing_id = create_test_entity["id"]
+    clashing_entity = {
+        "id": existing_id,
+        "name": f"Clashing {entity_type.title()}",
+        "description": "Tries to reuse an existing ID"
+    }
+
+    response, content = make_request(
+        "POST",
+        f"/themes/{theme}/{entity_type}",
+        expected_status=201,
+        json_data=clashing_entity
+    )
+
+    assert response.status_code == 201
+    assert content["id"] != existing_id
+
+    # The original entity must be untouched
+    response, content = make_request(
+        "GET",
+        f"/themes/{theme}/{entity_type}/{existing_id}"
+    )
+    assert response.status_code == 200
+    assert content["name"] == create_test_entity["name"]
+
 def test_get_entity(theme, entity_type, create_test_entity):
     """Test retrieving a specific entity by ID"""
     entity_id = create_test_entity["id"]